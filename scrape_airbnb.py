@@ -1,48 +1,148 @@
 # scrape_airbnb.py
-import os, csv, re, time, datetime
+import os, csv, re, time, datetime, json, sqlite3, asyncio, base64
+from dataclasses import dataclass, asdict
+from operator import attrgetter
 from urllib.parse import urljoin
-from playwright.sync_api import sync_playwright, TimeoutError as PWTimeout
+from playwright.async_api import async_playwright, TimeoutError as PWTimeout
+try:
+    import uvloop  # boucle libuv, plus rapide pour le trafic CDP ; optionnelle
+except ImportError:
+    uvloop = None
 
 START_URL   = os.getenv("START_URL", "https://www.airbnb.com/s/Dubai/homes")
 MAX_LIST    = int(os.getenv("MAX_LISTINGS", "20"))
 MAX_MINUTES = float(os.getenv("MAX_MINUTES", "5"))
 PROXY       = os.getenv("PROXY", "").strip() or None
+CONCURRENCY = max(1, int(os.getenv("CONCURRENCY") or "6"))
+PROFILE_DIR = os.getenv("PW_PROFILE_DIR", ".pw-profile")
 OUT_CSV     = "airbnb_results.csv"
+CACHE_DB    = os.getenv("CACHE_DB", "scrape_cache.db")
+CACHE_TTL_H = float(os.getenv("CACHE_TTL_HOURS", "24"))
+
+# une ligne du CSV : attributs à slots, dans l'ordre des colonnes
+@dataclass(slots=True)
+class Row:
+    url: str = ""
+    title: str = ""
+    license_code: str = ""
+    host_name: str = ""
+    host_overall_rating: str = ""
+    host_profile_url: str = ""
+    host_joined: str = ""
+    scraped_at: str = ""
+
+CSV_FIELDS = tuple(Row.__dataclass_fields__)
+row_values = attrgetter(*CSV_FIELDS)  # Row -> tuple des colonnes, sans dict intermédiaire
 
 # ---------------- utils ----------------
 
 def now_iso():
-    return datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc).isoformat()
-
-def write_csv(rows, path=OUT_CSV):
-    header = [
-        "url","title","license_code",
-        "host_name","host_overall_rating","host_profile_url","host_joined","scraped_at"
-    ]
-    with open(path, "w", newline="", encoding="utf-8-sig") as f:
-        w = csv.DictWriter(f, fieldnames=header)
-        w.writeheader()
-        for r in rows:
-            w.writerow({k: r.get(k, "") for k in header})
-
-def click_if_present(page, selector, timeout=3000):
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+def open_csv(path=OUT_CSV):
+    f = open(path, "w", newline="", encoding="utf-8-sig")
+    # csv.writer (liste) plutôt que DictWriter : pas d'indirection dict par ligne
+    w = csv.writer(f)
+    w.writerow(CSV_FIELDS)
+    return f, w
+
+# cache sqlite url -> ligne déjà scrapée : une relance saute les annonces récentes
+def open_cache(path=CACHE_DB):
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE IF NOT EXISTS done(url TEXT PRIMARY KEY, row TEXT, ts REAL)")
+    return db
+
+def cache_get(db, url, ttl_hours=CACHE_TTL_H):
+    r = db.execute(
+        "SELECT row FROM done WHERE url=? AND ts>?", (url, time.time() - ttl_hours * 3600)
+    ).fetchone()
+    if not r:
+        return None
+    d = json.loads(r[0])
+    return Row(**{k: d.get(k, "") for k in CSV_FIELDS})
+
+def cache_put(db, url, row):
+    db.execute(
+        "INSERT OR REPLACE INTO done VALUES(?,?,?)",
+        (url, json.dumps(asdict(row), ensure_ascii=False), time.time()),
+    )
+    db.commit()
+
+# ressources jamais lues par le scraper : on ne les télécharge pas
+BLOCKED_RESOURCES = {"image", "media", "font"}
+BLOCKED_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "datadoghq", "segment.io", "sentry.io", "hotjar",
+    "optimizely.com", "branch.io", "app.link", "facebook.net",
+)
+# une seule recherche sur le nom d'hôte au lieu d'un any() sur toute l'URL
+RE_BLOCKED_HOST = re.compile(
+    r"^[a-z]+://[^/]*(?:" + "|".join(re.escape(h) for h in BLOCKED_HOSTS) + ")"
+)
+_blocked = 0
+
+async def block_heavy(route):
+    global _blocked
+    req = route.request
+    if req.resource_type in BLOCKED_RESOURCES or RE_BLOCKED_HOST.match(req.url):
+        _blocked += 1
+        await route.abort()
+    else:
+        await route.continue_()
+
+async def click_if_present(page, selector, timeout=3000):
     try:
-        el = page.locator(selector).first
-        el.wait_for(state="visible", timeout=timeout)
-        el.click()
+        # premier candidat visible : un sélecteur OU peut aussi matcher des boutons cachés
+        el = page.locator(selector).filter(visible=True).first
+        await el.wait_for(state="visible", timeout=timeout)
+        await el.click()
         return True
     except Exception:
         return False
 
-def get_text_safe(loc, timeout=2500):
+async def get_text_safe(loc, timeout=2500):
     try:
-        return loc.inner_text(timeout=timeout).strip()
+        return (await loc.inner_text(timeout=timeout)).strip()
     except Exception:
         return ""
 
+# nouvel essai après base, 2*base, 4*base... s ; jamais d'attente au-delà de deadline
+async def retry(fn, attempts=3, base=0.5, deadline=None):
+    for i in range(attempts):
+        try:
+            return await fn()
+        except Exception:
+            pause = base * 2 ** i
+            if i == attempts - 1 or (deadline and time.time() + pause > deadline):
+                raise
+            await asyncio.sleep(pause)
+
 # ---------------- navigation ----------------
 
-def goto_search_with_retry(page):
+# le cookie de consentement reste dans le context : un seul clic suffit par process ;
+# à chaque run on re-sonde (cookie expiré, autre domaine Airbnb...), une attente de 4 s au plus
+_cookies_done = False
+# libellés du bouton de consentement (toutes langues) en une seule requête par rôle ;
+# mots entiers : "Accepter tous les cookies" passe, "Book" / "Lookup" non
+CONSENT_RE = re.compile(
+    r"\b(?:Accepter|J['’]accepte|D['’]accord|OK|Accept|I agree|Agree"
+    r"|Got it|Aceptar|Einverstanden|Akzeptieren|Ho capito|Accetta)\b",
+    re.I,
+)
+
+async def accept_cookies(page):
+    global _cookies_done
+    if _cookies_done:
+        return True
+    try:
+        btn = page.get_by_role("button", name=CONSENT_RE).filter(visible=True).first
+        await btn.click(timeout=4000)
+        _cookies_done = True
+    except Exception:
+        pass
+    return _cookies_done
+
+async def goto_search_with_retry(page, deadline=None):
     # Préfère le domaine fr pour limiter redirections.
     candidates = []
     if "fr.airbnb.com" in START_URL:
@@ -50,52 +150,67 @@ def goto_search_with_retry(page):
     else:
         candidates = [START_URL.replace("www.airbnb.com","fr.airbnb.com"), START_URL]
 
+    async def load(url):
+        await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+        await accept_cookies(page)
+        # attend qu’au moins une carte soit chargée
+        await page.wait_for_selector('a[href^="/rooms/"]', timeout=30000)
+
     last_err = None
     for url in candidates:
-        for _ in range(2):
-            try:
-                page.goto(url, wait_until="domcontentloaded", timeout=60000)
-                # cookies
-                click_if_present(page, 'button:has-text("Accepter")', 4000) or \
-                click_if_present(page, 'button:has-text("I agree")', 4000) or \
-                click_if_present(page, 'button:has-text("OK")', 4000)
-                # attend qu’au moins une carte soit chargée
-                page.wait_for_selector('a[href^="/rooms/"]', timeout=30000)
-                return
-            except Exception as e:
-                last_err = e
-                try:
-                    page.reload(wait_until="domcontentloaded", timeout=30000)
-                except Exception:
-                    pass
+        if deadline and time.time() > deadline:
+            break
+        try:
+            return await retry(lambda: load(url), attempts=2, deadline=deadline)
+        except Exception as e:
+            last_err = e
     raise last_err if last_err else RuntimeError("navigation failed")
 
 # ---------------- collecte URLs ----------------
 
-def collect_listing_urls(page, max_items, max_minutes):
-    goto_search_with_retry(page)
-
-    start = time.time()
-    seen = set()
+# filtre + canonicalise les liens /rooms/ côté navigateur : un seul aller-retour CDP par scroll
+JS_ROOM_URLS = """limit => {
+    const out = new Set();
+    for (const a of document.querySelectorAll('a[href^="/rooms/"]')) {
+        const href = a.getAttribute("href") || "";
+        if (href.includes("experiences")) continue;
+        out.add(location.origin + href.split(/[?#]/)[0]);
+        if (out.size >= limit) break;
+    }
+    return [...out];
+}"""
+
+# relève (nb de cartes, hauteur) puis scrolle, en un seul aller-retour
+JS_SCROLL_STEP = """() => {
+    const n = document.querySelectorAll('a[href^="/rooms/"]').length;
+    const h = document.body.scrollHeight;
+    window.scrollBy(0, h);
+    return [n, h];
+}"""
+JS_LIST_GREW = """([n, h]) =>
+    document.querySelectorAll('a[href^="/rooms/"]').length > n || document.body.scrollHeight > h"""
+
+async def collect_listing_urls(page, max_items, deadline):
+    await goto_search_with_retry(page, deadline=deadline)
+
+    seen = {}  # dict = set ordonné : garde l'ordre d'apparition des annonces
     last_h = 0
 
-    while len(seen) < max_items and (time.time() - start) < (max_minutes * 60):
-        for a in page.locator('a[href^="/rooms/"]').all():
-            try:
-                href = a.get_attribute("href") or ""
-                if not href or "experiences" in href:
-                    continue
-                full = urljoin(page.url, href.split("?")[0])
-                if "/rooms/" in full:
-                    seen.add(full)
-                    if len(seen) >= max_items:
-                        break
-            except Exception:
-                continue
+    while len(seen) < max_items and time.time() < deadline:
+        for full in await page.evaluate(JS_ROOM_URLS, max_items):
+            seen[full] = None
+            if len(seen) >= max_items:
+                break
+        if len(seen) >= max_items:
+            break  # quota atteint : pas de scroll ni d'attente de plus
 
-        page.evaluate("window.scrollBy(0, document.body.scrollHeight)")
-        page.wait_for_timeout(700)
-        h = page.evaluate("document.body.scrollHeight")
+        prev = await page.evaluate(JS_SCROLL_STEP)
+        # avance dès que des cartes arrivent ou que la page s'allonge ; le plafond ne coûte qu'en fin de liste
+        try:
+            await page.wait_for_function(JS_LIST_GREW, arg=prev, timeout=3000)
+        except PWTimeout:
+            pass
+        h = await page.evaluate("document.body.scrollHeight")
         if h == last_h:
             break
         last_h = h
@@ -106,183 +221,440 @@ def collect_listing_urls(page, max_items, max_minutes):
         print(f"#{i} {u}")
     return urls
 
-# ---------------- LICENSE (inchangé) ----------------
+# ---------------- LICENSE ----------------
 
-RE_LICENSES = [
-    re.compile(r"\b[A-Z]{3}-[A-Z]{3}-[A-Z0-9]{4,6}\b"),
-    re.compile(r"\b\d{5,8}\b"),
-    re.compile(r"\b[A-Z0-9]{5,}\b"),
-]
+# les trois formes de numéro en une seule passe ; LICENSE_PRIORITY garde l'ordre historique
+RE_LICENSE = re.compile(
+    r"(?P<dashed>\b[A-Z]{3}-[A-Z]{3}-[A-Z0-9]{4,6}\b)"
+    r"|(?P<digits>\b\d{5,8}\b)"
+    r"|(?P<code>\b[A-Z0-9]{5,}\b)"
+)
+LICENSE_PRIORITY = {"dashed": 0, "digits": 1, "code": 2}
+# mots-clés (insensibles à la casse) : simple pré-filtre, "permitted" ou "Tourism Dirham" y passent
 LABEL_PATTERNS = [
-    "Infos d'enregistrement","Détails de l'enregistrement",
-    "Registration details","License","Licence","Permit"
+    "enregistrement", "registration", "license", "licence", "permit", "tourism", "DTCM",
 ]
+RE_LABEL_HINT = re.compile("|".join(re.escape(lbl) for lbl in LABEL_PATTERNS), re.I)
+# vrais libellés, en mots entiers : c'est eux qui ouvrent la fenêtre de recherche du numéro
+RE_LABELS = re.compile(
+    r"\b(?:(?:registration|licen[cs]e|permit)(?:\s*(?:n(?:o|°|umber)\.?|details))?"
+    r"|(?:num[ée]ro|infos?|d[ée]tails)\s+d(?:e\s+l)?['’]\s*enregistrement"
+    r"|DTCM)\b",
+    re.I,
+)
+
+# sections où Airbnb affiche le numéro d'enregistrement (bien plus court que le body)
+POLICIES_SEL = (
+    '[data-section-id="POLICIES_DEFAULT"], [data-section-id="HOUSE_RULES_DEFAULT"], '
+    'div[data-plugin-in-point-id="POLICIES_DEFAULT"]'
+)
+
+# boutons qui ouvrent la description complète : une seule attente au lieu de quatre
+READ_MORE_SEL = (
+    'button:has-text("Lire la suite"), span:has-text("Lire la suite"), '
+    'button:has-text("Afficher plus"), button:has-text("Read more")'
+)
+
+def license_from_text(text_scope, kinds=LICENSE_PRIORITY):
+    # les formes larges (chiffres, code) exigent un vrai libellé et ne sont cherchées que
+    # juste après lui ; la forme BUR-BUR-XXXX est assez précise pour être prise partout
+    m = RE_LABELS.search(text_scope) if RE_LABEL_HINT.search(text_scope) else None
+    if m:
+        code = first_license_match(text_scope[m.end():m.end()+800], kinds)
+        if code:
+            return code
+    return first_license_match(text_scope, ("dashed",))
+
+def first_license_match(text_scope, kinds=LICENSE_PRIORITY):
+    best = None
+    for m in RE_LICENSE.finditer(text_scope):
+        kind = m.lastgroup
+        if kind not in kinds:
+            continue
+        if best is None or LICENSE_PRIORITY[kind] < LICENSE_PRIORITY[best.lastgroup]:
+            best = m
+            if kind == "dashed":
+                break
+    return best.group(0) if best else ""
 
-def extract_license_code(page):
-    opened = (
-        click_if_present(page, 'button:has-text("Lire la suite")') or
-        click_if_present(page, 'span:has-text("Lire la suite")') or
-        click_if_present(page, 'button:has-text("Afficher plus")') or
-        click_if_present(page, 'button:has-text("Read more")')
-    )
-    text_scope = ""
-    if opened:
+async def extract_license_code(page):
+    if await click_if_present(page, READ_MORE_SEL):
         try:
             dlg = page.locator('[role="dialog"], [aria-modal="true"]').first
-            dlg.wait_for(state="visible", timeout=3000)
-            text_scope = get_text_safe(dlg, timeout=3000)
+            await dlg.wait_for(state="visible", timeout=3000)
+            code = license_from_text(await get_text_safe(dlg, timeout=3000))
+            if code:
+                return code
         except Exception:
             pass
-    if not text_scope:
-        text_scope = get_text_safe(page.locator("body"), timeout=6000)
-
-    if any(lbl in text_scope for lbl in LABEL_PATTERNS):
-        for lbl in LABEL_PATTERNS:
-            i = text_scope.find(lbl)
-            if i >= 0:
-                text_scope = text_scope[i:i+800]
-                break
 
-    for rx in RE_LICENSES:
-        m = rx.search(text_scope)
-        if m:
-            return m.group(0)
-    return ""
+    # section règlement d'abord, body entier seulement en dernier recours
+    try:
+        policies = page.locator(POLICIES_SEL).first
+        if await policies.count():
+            code = license_from_text(await get_text_safe(policies, timeout=3000))
+            if code:
+                return code
+    except Exception:
+        pass
+
+    # sinon le bloc autour du libellé, localisé par le moteur texte de Playwright
+    try:
+        lbl = page.get_by_text(RE_LABELS).first
+        if not await lbl.count():
+            return ""  # aucun libellé dans la page : inutile de lire le body
+        code = license_from_text(
+            await lbl.evaluate("e => (e.parentElement || e).innerText", timeout=3000)
+        )
+        if code:
+            return code
+    except Exception:
+        pass
+    return license_from_text(await get_text_safe(page.locator("body"), timeout=6000))
 
 # ---------------- HOST (depuis bloc “Faites connaissance…”) ----------------
 
-def find_host_section(page):
-    candidates = [
-        'section:has(h2:has-text("Faites connaissance avec votre hôte"))',
-        'section:has(h2:has-text("Meet your Host"))',
-        'section:has(h2:has-text("Get to know your host"))',
-        'section:has(h2:has-text("Conoce a tu anfitri"))',
-        'section:has(h2:has-text("Erfahre mehr über deinen Gastgeber"))',
-    ]
-    for sel in candidates:
-        loc = page.locator(sel)
-        try:
-            if loc.count() and loc.first.is_visible():
-                return loc.first
-        except Exception:
-            continue
-    return None
-
-def extract_host_fields(page, listing_url):
-    host_name = host_overall_rating = host_profile_url = host_joined = ""
-    # scroll vers le bas pour charger le bloc hôte
+# note (trois formes) + année d'inscription en une seule passe ;
+# le groupe nommé dit quelle forme a matché, RATING_PRIORITY départage les notes
+RE_HOST_FACTS = re.compile(
+    r"(?P<star>\d+(?:[.,]\d+)?)\s*[★*]"
+    r"|Note globale\s*:?\s*(?P<note>[0-9]+(?:[.,][0-9]+)?)"
+    r"|(?P<reviews>\d+(?:[.,]\d+)?)\s*[•·]\s*(?:avis|reviews)"
+    r"|(?:depuis|since)\s+(?:\w+\s+)?(?P<joined>\d{4})",
+    re.I,
+)
+RATING_PRIORITY = {"star": 0, "note": 1, "reviews": 2}
+
+# ids de section stables d'abord (simple querySelector), textes de titre ensuite
+HOST_SECTION_IDS = ['[data-section-id^="HOST_PROFILE"]', '[data-section-id^="MEET_YOUR_HOST"]']
+HOST_HEADINGS = [
+    "Faites connaissance avec votre hôte",
+    "Meet your Host",
+    "Get to know your host",
+    "Conoce a tu anfitri",
+    "Erfahre mehr über deinen Gastgeber",
+]
+HOST_SECTION_SELECTORS = HOST_SECTION_IDS + [
+    f'section:has(h2:has-text("{h}"))' for h in HOST_HEADINGS
+]
+HOST_SECTION_ANY = ", ".join(HOST_SECTION_SELECTORS)
+HOST_LOOKUP = [HOST_SECTION_IDS, [h.lower() for h in HOST_HEADINGS]]
+
+# titre + bloc hôte (même ordre de recherche que HOST_SECTION_SELECTORS) en un seul aller-retour
+JS_LISTING_FIELDS = """([ids, headings]) => {
+    const visible = el => el.getClientRects().length > 0;
+    const norm = el => (el.textContent || "").replace(/\\s+/g, " ").toLowerCase();
+    let sect = null;
+    for (const sel of ids) {
+        const el = document.querySelector(sel);
+        if (el && visible(el)) { sect = el; break; }
+    }
+    if (!sect) {
+        const sections = [...document.querySelectorAll("section")];
+        for (const t of headings) {
+            const el = sections.find(s => [...s.querySelectorAll("h2")].some(h => norm(h).includes(t)));
+            if (el && visible(el)) { sect = el; break; }
+        }
+    }
+    const og = document.querySelector('meta[property="og:title"]');
+    const h1 = document.querySelector('h1[data-testid="title"]') || document.querySelector("h1");
+    const a = sect ? sect.querySelector('a[href^="/users/show/"]') : null;
+    return {
+        title: ((og && og.content) || (h1 && h1.innerText) || "").trim(),
+        host_found: !!sect,
+        host_href: a ? (a.getAttribute("href") || "") : "",
+        host_name: a ? a.innerText.trim() : "",
+        host_text: sect ? (sect.innerText || "") : "",
+    };
+}"""
+
+async def read_listing_fields(page):
+    # scroll vers le bas jusqu'à ce que le bloc hôte apparaisse (6 crans max)
     for _ in range(6):
-        page.mouse.wheel(0, 1400)
-        page.wait_for_timeout(250)
+        await page.mouse.wheel(0, 1400)
+        try:
+            await page.wait_for_selector(HOST_SECTION_ANY, timeout=250)
+            break
+        except PWTimeout:
+            pass
 
-    sect = find_host_section(page)
-    if not sect:
+    info = await page.evaluate(JS_LISTING_FIELDS, HOST_LOOKUP)
+    if not info["host_found"]:
         try:
-            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            page.wait_for_timeout(700)
+            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            await page.wait_for_selector(HOST_SECTION_ANY, timeout=700)
         except Exception:
             pass
-        sect = find_host_section(page)
-    if not sect:
-        return host_name, host_overall_rating, host_profile_url, host_joined
+        info = await page.evaluate(JS_LISTING_FIELDS, HOST_LOOKUP)
+    return info
+
+def host_fields(info, listing_url):
+    host_name = host_overall_rating = host_profile_url = host_joined = ""
 
     # URL du profil hôte (dans le bloc hôte uniquement)
-    try:
-        link = sect.locator('a[href^="/users/show/"]').first
-        if link.count():
-            href = link.get_attribute("href")
-            if href:
-                host_profile_url = urljoin(listing_url, href.split("?")[0])
-    except Exception:
-        link = None
+    if info["host_href"]:
+        host_profile_url = urljoin(listing_url, info["host_href"].split("?")[0])
 
     # Nom de l’hôte
-    try:
-        text = link.inner_text().strip() if link and link.count() else ""
-        if not text:
-            text = sect.locator('a[href^="/users/show/"]').first.inner_text().strip()
-        if text and len(text) < 60:
-            host_name = text
-    except Exception:
-        pass
+    if info["host_name"] and len(info["host_name"]) < 60:
+        host_name = info["host_name"]
+
+    # Note globale de l’hôte + année depuis quand sur Airbnb
+    best = None
+    for m in RE_HOST_FACTS.finditer(info["host_text"]):
+        kind = m.lastgroup
+        if kind == "joined":
+            host_joined = host_joined or m.group(kind)
+        elif best is None or RATING_PRIORITY[kind] < RATING_PRIORITY[best.lastgroup]:
+            best = m
+        if host_joined and best and best.lastgroup == "star":
+            break
+    if best:
+        host_overall_rating = best.group(best.lastgroup).replace(",", ".")
 
-    # Texte brut du bloc pour rating + année d’inscription
+    return {
+        "host_name": host_name, "host_overall_rating": host_overall_rating,
+        "host_profile_url": host_profile_url, "host_joined": host_joined,
+    }
+
+# ---------------- JSON (réponses StaysPdpSections) ----------------
+
+RE_LICENSE_KEYS = re.compile(r"licen[cs]e|registration|permit", re.I)
+HOST_CARD_KEYS = ("ratingAverage", "userId", "hostId", "isSuperhost")
+
+def walk_json(blob):
+    # parcours itératif (pile), dans l'ordre du document (enfants empilés à l'envers) ;
+    # in_host / in_policies = on est sous une section (ou clé) hôte / règlement
+    stack = [(blob, False, False)]
+    while stack:
+        cur, in_host, in_policies = stack.pop()
+        if isinstance(cur, dict):
+            section = str(cur.get("sectionId") or "")
+            in_host = in_host or "HOST" in section
+            in_policies = in_policies or "POLICIES" in section
+            yield cur, in_host, in_policies
+            for k, v in reversed(cur.items()):
+                if isinstance(v, (dict, list)):
+                    stack.append((v, in_host or "host" in k.lower(), in_policies))
+        elif isinstance(cur, list):
+            stack.extend(
+                (v, in_host, in_policies) for v in reversed(cur) if isinstance(v, (dict, list))
+            )
+
+def user_id(v):
+    # ids GraphQL souvent en base64 ("DemandUser:123")
+    s = str(v or "")
+    if s.isdigit():
+        return s
     try:
-        block = sect.inner_text(timeout=3000)
+        s = base64.b64decode(s + "=" * (-len(s) % 4)).decode().rsplit(":", 1)[-1]
     except Exception:
-        block = ""
-
-    # Note globale de l’hôte
-    m = re.search(r"(\d+(?:[.,]\d+)?)\s*[★*]", block) \
-        or re.search(r"Note globale\s*:?[\s\n]*([0-9]+(?:[.,][0-9]+)?)", block, re.I) \
-        or re.search(r"(\d+(?:[.,]\d+)?)\s*[•·]\s*(?:avis|reviews)", block, re.I)
-    if m:
-        host_overall_rating = m.group(1).replace(",", ".")
-
-    # Année/mois depuis quand sur Airbnb
-    m2 = re.search(r"(depuis|since)\s+(?:\w+\s+)?(\d{4})", block, re.I)
-    if m2:
-        host_joined = m2.group(2)
-
-    return host_name, host_overall_rating, host_profile_url, host_joined
+        return ""
+    return s if s.isdigit() else ""
+
+# état de la fiche rendu côté serveur, embarqué dans le HTML (lu en un seul evaluate)
+EMBEDDED_STATE_SEL = "script#data-deferred-state-0, script#__NEXT_DATA__"
+JS_EMBEDDED_STATE = f"""() => [...document.querySelectorAll("{EMBEDDED_STATE_SEL}")].map(e => e.textContent)"""
+
+def json_fields(blobs, listing_url):
+    out = {}
+    for blob in blobs:
+        for d, in_host, in_policies in walk_json(blob):
+            if "license_code" not in out:
+                for k, v in d.items():
+                    if not isinstance(v, str):
+                        continue
+                    # clé licence/enregistrement, ou texte libellé d'une section règlement ;
+                    # jamais la forme large "code" (descriptions, avis... en regorgent)
+                    if RE_LICENSE_KEYS.search(k):
+                        code = first_license_match(v, ("dashed", "digits"))
+                    elif in_policies:
+                        code = license_from_text(v, ("dashed", "digits"))
+                    else:
+                        code = ""
+                    if code:
+                        out["license_code"] = code
+                        break
+            if "host_name" not in out and in_host and isinstance(d.get("name"), str) \
+                    and any(k in d for k in HOST_CARD_KEYS):
+                out["host_name"] = d["name"].strip()
+                if isinstance(d.get("ratingAverage"), (int, float)) and d["ratingAverage"]:
+                    out["host_overall_rating"] = str(d["ratingAverage"])
+                uid = user_id(d.get("userId") or d.get("hostId"))
+                if uid:
+                    out["host_profile_url"] = urljoin(listing_url, f"/users/show/{uid}")
+    return {k: v for k, v in out.items() if v}
 
 # ---------------- parsing PDP ----------------
 
-def parse_listing(page, url):
-    data = {
-        "url": url, "title": "", "license_code": "",
-        "host_name": "", "host_overall_rating": "",
-        "host_profile_url": "", "host_joined": "", "scraped_at": now_iso()
-    }
+async def parse_listing(page, url, scraped_at, deadline=None):
+    data = Row(url=url, scraped_at=scraped_at)
+    # payloads GraphQL de la fiche, capturés au passage (aucune attente dédiée)
+    payloads = []
+    def on_response(resp):
+        if "StaysPdpSections" in resp.url:
+            payloads.append(resp)
+    listening = False
     try:
-        page.goto(url, wait_until="domcontentloaded", timeout=60000)
-        page.wait_for_timeout(600)
+        # "commit" rend la main dès les en-têtes ; on attend ensuite juste le titre
+        await retry(lambda: page.goto(url, wait_until="commit"), attempts=2, deadline=deadline)
+        # écoute branchée après le commit : la page est réutilisée, une réponse tardive de
+        # l'annonce précédente ne doit pas atterrir ici (le XHR part après le bundle JS)
+        page.on("response", on_response)
+        listening = True
+        try:
+            await page.locator('h1[data-testid="title"], h1').first.wait_for(timeout=15000)
+        except PWTimeout:
+            pass
 
-        title = (
-            page.locator('meta[property="og:title"]').first.get_attribute("content") or
-            get_text_safe(page.locator('h1[data-testid="title"]')) or
-            get_text_safe(page.locator("h1"))
-        )
-        data["title"] = title
+        # Titre + host via bloc dédié, lus ensemble une fois le bloc hôte chargé ;
+        # le XHR StaysPdpSections part après le bundle JS, donc bien après le h1
+        info = await read_listing_fields(page)
+
+        blobs = []
+        for resp in payloads:
+            try:
+                blobs.append(await resp.json())
+            except Exception:
+                pass
+
+        # JSON d'abord (réponses GraphQL, puis état embarqué si des champs manquent) ;
+        # le JSON garde la priorité sur le DOM
+        fields = json_fields(blobs, url)
+        if "license_code" not in fields or "host_name" not in fields:
+            embedded = []
+            try:
+                raws = await page.evaluate(JS_EMBEDDED_STATE)
+            except Exception:
+                raws = []  # page plantée ou navigation : on garde au moins le DOM déjà lu
+            for raw in raws:
+                try:
+                    embedded.append(json.loads(raw))
+                except ValueError:
+                    pass
+            for k, v in json_fields(embedded, url).items():
+                fields.setdefault(k, v)
+        for k, v in fields.items():
+            setattr(data, k, v)
 
-        # Host via bloc dédié
-        hn, hr, hp, hj = extract_host_fields(page, url)
-        data.update({"host_name": hn, "host_profile_url": hp, "host_overall_rating": hr, "host_joined": hj})
+        data.title = info["title"]
+        for k, v in host_fields(info, url).items():
+            setattr(data, k, getattr(data, k) or v)
 
-        # Licence via méthode inchangée
-        data["license_code"] = extract_license_code(page)
+        # Licence via le DOM seulement si le JSON ne l'a pas donnée (évite modale + body)
+        if not data.license_code:
+            data.license_code = await extract_license_code(page)
 
     except Exception as e:
         print(f"ERROR parsing {url}: {e}")
+    finally:
+        if listening:
+            page.remove_listener("response", on_response)
     return data
 
 # ---------------- main ----------------
 
-def main():
-    rows = []
-    with sync_playwright() as p:
-        launch_args = {"headless": True}
+# rend une page utilisable : remplace celle dont le renderer est mort (crash, fermeture)
+async def ensure_page(context, pg):
+    if pg is not None and not pg.is_closed():
+        try:
+            await pg.evaluate("1")
+            return pg
+        except Exception:
+            try:
+                await pg.close()
+            except Exception:
+                pass
+    return await context.new_page()
+
+# en plus des flags que Playwright passe déjà (sync, extensions, traduction, réseau de fond...) ;
+# imagesEnabled=false coupe les images dans Blink, sans aller-retour block_heavy par image
+CHROMIUM_ARGS = [
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--blink-settings=imagesEnabled=false",
+]
+
+async def main():
+    saved = 0
+    # un seul budget MAX_MINUTES pour tout le run (collecte + annonces)
+    deadline = time.time() + MAX_MINUTES * 60
+    async with async_playwright() as p:
+        launch_args = {"headless": True, "args": CHROMIUM_ARGS}
         if PROXY:
             launch_args["proxy"] = {"server": PROXY}
-        browser = p.chromium.launch(**launch_args)
-        context = browser.new_context(
+        # profil persistant : cookies (consentement, session) conservés d'un run à l'autre ;
+        # pas de cache HTTP à en attendre, Playwright le désactive dès que context.route est actif
+        context = await p.chromium.launch_persistent_context(
+            PROFILE_DIR,
+            **launch_args,
             locale="fr-FR",
             user_agent=("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
                         "(KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"),
             viewport={"width":1280,"height":1600},
             timezone_id="Europe/Paris",
         )
-        page = context.new_page()
-
-        urls = collect_listing_urls(page, MAX_LIST, MAX_MINUTES)
+        await context.route("**/*", block_heavy)
+        # plafond commun des navigations (goto, clics qui naviguent) : 20 s au lieu de 30
+        context.set_default_navigation_timeout(20000)
+        page = await context.new_page()
+
+        urls = await collect_listing_urls(page, MAX_LIST, deadline)
+        await page.close()
+
+        # écrit chaque ligne dès qu'elle est prête (mémoire constante, rien de perdu en cas de crash)
+        db = open_cache()
+        f, w = open_csv()
+        scraped_at = now_iso()  # horodatage du run, commun à toutes les lignes
+        queue = asyncio.Queue()
         for u in urls:
-            rows.append(parse_listing(page, u))
-
-        write_csv(rows)
-        print(f"SAVED {len(rows)} rows to {OUT_CSV}")
+            queue.put_nowait(u)
 
-        context.close()
-        browser.close()
+        # K workers, chacun avec sa page réutilisée d'une annonce à l'autre
+        async def worker():
+            nonlocal saved
+            pg = None
+            try:
+                while not queue.empty():
+                    u = queue.get_nowait()
+                    row = cache_get(db, u)
+                    if row is None:
+                        pg = await ensure_page(context, pg)
+                        row = await parse_listing(pg, u, scraped_at, deadline)
+                        # pas de titre = page non chargée, on ne la met pas en cache
+                        if row.title:
+                            cache_put(db, u, row)
+                    else:
+                        print(f"CACHED {u}")
+                    w.writerow(row_values(row))
+                    f.flush()
+                    saved += 1
+            finally:
+                if pg is not None:
+                    await pg.close()
+
+        results = []
+        with f:
+            try:
+                results = await asyncio.wait_for(
+                    asyncio.gather(
+                        *(worker() for _ in range(min(CONCURRENCY, len(urls)))),
+                        return_exceptions=True,
+                    ),
+                    timeout=max(0, deadline - time.time()),
+                )
+            except asyncio.TimeoutError:
+                print(f"TIMEOUT after {MAX_MINUTES} min")
+        db.close()
+
+        # un worker mort (sqlite, new_page après crash) emporte l'annonce qu'il traitait
+        for r in results:
+            if isinstance(r, BaseException):
+                print(f"ERROR worker: {r!r}")
+        print(f"SAVED {saved} rows to {OUT_CSV}, {len(urls) - saved} listings skipped")
+        print(f"BLOCKED {_blocked} requests")
+
+        await context.close()
 
 if __name__ == "__main__":
-    main()
+    (uvloop.run if uvloop else asyncio.run)(main())